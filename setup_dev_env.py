@@ -6,184 +6,759 @@ This script installs a curated list of development tools using winget and npm.
 It checks for existing installations, and prompts for updates.
 """
 
+import argparse
+import importlib.util
+import json
+import os
+import re
+import shutil
 import subprocess
 import sys
+import tempfile
+import threading
 import time
-from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from pathlib import Path
+from typing import Deque, List, Dict, Optional, Tuple
+from dataclasses import dataclass, field
 
+# orjson is optional: it parses JSON straight from bytes and is noticeably faster than stdlib json
 try:
-    from rich.console import Console
-    from rich.prompt import Confirm
+    import orjson as _json
 except ImportError:
-    print("rich library not found. Installing...")
-    subprocess.run([sys.executable, "-m", "pip", "install", "rich"], check=True)
+    import json as _json
+
+# rich (and everything it pulls in) is only loaded once an installer is created, see _load_rich()
+console = None
+Confirm = None
+Prompt = None
+escape = None
+
+# Shared by every unattended winget install/upgrade; --disable-interactivity (winget 1.4+) turns any
+# prompt winget itself would raise into a failure instead of a hang
+WINGET_INSTALL_FLAGS = ("--exact", "--accept-source-agreements", "--accept-package-agreements", "--silent", "--disable-interactivity")
+# Large installers (Docker Desktop, VS Code) can legitimately take many minutes on a slow connection
+INSTALL_TIMEOUT = 30 * 60
+# 'winget import' gets INSTALL_TIMEOUT per package, but never more than this in total
+WINGET_IMPORT_TIMEOUT = 2 * 60 * 60
+# With --parallel-install these still go one at a time: their installers register services, drivers or
+# shell integrations, or run through Windows Installer (MSI/WiX bundles), which allows one install at a time
+WINGET_SERIAL_ONLY = frozenset({"Oracle.VirtualBox", "Docker.DockerDesktop", "Microsoft.VisualStudioCode", "OpenJS.NodeJS", "Microsoft.PowerToys", "Google.Chrome"})
+# ERROR_INSTALL_ALREADY_RUNNING from msiexec, and the APPINSTALLER_CLI_ERROR_INSTALL_INSTALL_IN_PROGRESS
+# winget maps it to: another MSI install held the Windows Installer mutex, so the package is retried serially
+WINGET_INSTALL_IN_PROGRESS = frozenset({1618, 0x8A150102})
+
+# Only for the short probes and scans: they are not meant to be interrupted and need no console of their own.
+# Installs keep the inherited console so Ctrl+C reaches winget/npm as well.
+_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+# Per-package npm installs run one at a time by default: npm takes no lock between processes on the global
+# prefix, so concurrent 'npm install -g' runs can fail renaming into node_modules (ENOTEMPTY/EPERM on Windows)
+NPM_DEFAULT_WORKERS = 1
+
+CACHE_DIR = Path.home() / ".cache" / "windev-setup"
+# Resolved tool paths/versions are trusted for a day before being probed again
+ENV_CACHE_TTL = 24 * 60 * 60
+
+# Global npm state is reused between runs for this long unless --refresh is passed
+NPM_STATE_TTL = 6 * 60 * 60
+NPM_STATE_CACHE = "npm-state.json"
+# The winget list/upgrade scans are the slowest part of a warm rerun, but winget sources change more often
+WINGET_STATE_TTL = 60 * 60
+WINGET_STATE_CACHE = "winget-state.json"
+
+# 'winget import' takes packages grouped by source; these are the details 'winget export' writes for the defaults
+WINGET_SOURCE_DETAILS = {
+    "winget": {"Argument": "https://cdn.winget.microsoft.com/cache", "Identifier": "Microsoft.Winget.Source_8wekyb3d8bbwe", "Name": "winget", "Type": "Microsoft.PreIndexed.Package"},
+    "msstore": {"Argument": "https://storeedgefd.dsx.mp.microsoft.com/v9.0", "Identifier": "StoreEdgeFD", "Name": "msstore", "Type": "Microsoft.Rest"},
+}
+
+# Only the end of an installer's output is kept around for error reporting
+OUTPUT_TAIL_LINES = 200
+# How long output may keep arriving once a command has exited, e.g. from a grandchild holding the pipe
+READER_GRACE_PERIOD = 10
+
+# APPINSTALLER_CLI_ERROR_NO_APPLICATIONS_FOUND: winget's exit code when an --exact --id install names a package
+# no source knows about. The message text is localized, the code is not.
+WINGET_NO_APPLICATIONS_FOUND = 0x8A150014
+# Exit codes of a list/upgrade scan whose table can be trusted; "no applications found" just means an empty one
+WINGET_SCAN_OK = frozenset({0, WINGET_NO_APPLICATIONS_FOUND})
+
+# npm < 10 prefixes errors with "npm ERR!", newer releases with "npm error"
+_NPM_ERROR_RE = re.compile(r"npm (?:ERR!|error).*?(@?[\w\-./]+)@")
+# Plain-text fallbacks for when npm's JSON output can't be used: "+-- @vue/cli@5.0.8" and the outdated table rows
+_NPM_LS_RE = re.compile(r"([@\w\-./]+)@(\d[\w.\-+]*)")
+_NPM_OUTDATED_RE = re.compile(r"^(@?[\w\-./]+)\s+(\S+)\s+(\S+)\s+(\S+)", re.M)
+# winget table layout: the dashed rule under each header, and the header words that mark column starts
+_WINGET_SEPARATOR_RE = re.compile(r"^-{3,}[ \t]*$", re.M)
+_WINGET_COLUMN_RE = re.compile(r"\S+")
+
+def _load_rich():
+    global console, Confirm, Prompt, escape
+    if console is not None:
+        return
+    # find_spec checks availability without importing, so the pip bootstrap only runs when needed
+    if importlib.util.find_spec("rich") is None:
+        print("rich library not found. Installing...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "--quiet", "rich"])
     from rich.console import Console
-    from rich.prompt import Confirm
+    from rich.markup import escape
+    from rich.prompt import Confirm, Prompt
+    console = Console()
+
+class _PlainStatus:
+    # Stand-in for rich's Status when output is piped: every update becomes one plain line
+    def __init__(self, quiet: bool = False):
+        self.quiet = quiet
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def update(self, status: str):
+        if not self.quiet:
+            console.print(status)
+
+def _status(message: str, quiet: bool = False):
+    # The live spinner repaints in a background thread; only worth it on an interactive terminal
+    if console.is_terminal:
+        return console.status(message)
+    status = _PlainStatus(quiet)
+    status.update(message)
+    return status
+
+def _hresult(returncode: Optional[int]) -> Optional[int]:
+    # winget exits with HRESULTs; depending on how the exit code is read they show up signed or unsigned
+    return None if returncode is None else returncode & 0xFFFFFFFF
+
+def _read_cache(name: str, ttl: float) -> Optional[Dict]:
+    try:
+        data = json.loads((CACHE_DIR / name).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or time.time() - data.get("timestamp", 0) >= ttl:
+        return None
+    return data
+
+def _write_cache(name: str, data: Dict):
+    # Swap a fully written temp file into place so an interrupted run never leaves a truncated cache
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = CACHE_DIR / f"{name}.tmp"
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp_path, CACHE_DIR / name)
+    except OSError:
+        pass
 
-console = Console()
+def _parse_winget_table(output: str) -> List[List[str]]:
+    # winget prints fixed-width tables: a header row, a row of dashes, then the data rows.
+    # Column offsets come from where each header word starts, since names and versions may contain spaces.
+    # The progress spinner before a table uses bare \r, so those are normalised to line breaks first.
+    text = output.replace("\r\n", "\n").replace("\r", "\n")
+    separators = [match for match in _WINGET_SEPARATOR_RE.finditer(text) if match.start() > 0]
+    header_starts = [text.rfind("\n", 0, separator.start() - 1) + 1 for separator in separators]
 
-@dataclass
+    rows: List[List[str]] = []
+    for index, separator in enumerate(separators):
+        header = text[header_starts[index]:separator.start() - 1]
+        starts = [match.start() for match in _WINGET_COLUMN_RE.finditer(header)]
+        body_end = header_starts[index + 1] if index + 1 < len(separators) else len(text)
+        bounds = list(zip(starts, starts[1:] + [None]))
+        for line in text[separator.end():body_end].split("\n"):
+            if line.strip():
+                rows.append([line[start:end].strip() for start, end in bounds])
+    return rows
+
+@dataclass(frozen=True, slots=True)
 class WingetPackage:
     name: str
     winget_id: str
+    source: str = "winget"
+    # Lookup key into the winget snapshots, which are keyed case-insensitively
+    winget_id_lc: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "winget_id_lc", self.winget_id.casefold())
+
+WINGET_PACKAGES: Tuple[WingetPackage, ...] = (
+    WingetPackage("Visual Studio Code", "Microsoft.VisualStudioCode"),
+    WingetPackage("Oh My Posh", "JanDeDobbeleer.OhMyPosh"),
+    WingetPackage("JetBrainsMono Nerd Font", "Microsoft.NerdFonts.FiraCode"),
+    WingetPackage("Fastfetch", "Fastfetch-cli.Fastfetch"),
+    WingetPackage("Git", "Microsoft.Git"),
+    WingetPackage("Node.js", "OpenJS.NodeJS"),
+    WingetPackage("Docker Desktop", "Docker.DockerDesktop"),
+    WingetPackage("Google Chrome", "Google.Chrome"),
+    WingetPackage("Brave Browser", "Brave.Brave"),
+    WingetPackage("VirtualBox", "Oracle.VirtualBox"),
+    WingetPackage("Claude Desktop", "Anthropic.Claude"),
+    WingetPackage("PowerToys", "Microsoft.PowerToys"),
+    WingetPackage("Windows Terminal", "Microsoft.WindowsTerminal"),
+    WingetPackage("7-Zip", "7zip.7zip"),
+    WingetPackage("Postman", "Postman.Postman"),
+    WingetPackage("Discord", "Discord.Discord"),
+    WingetPackage("Slack", "SlackTechnologies.Slack"),
+    WingetPackage("Notion", "Notion.Notion"),
+    WingetPackage("OBS Studio", "OBSProject.OBSStudio"),
+    WingetPackage("VLC media player", "VideoLAN.VLC"),
+    WingetPackage("WhatsApp", "9NKSQGP7F2NH", "msstore"),
+    WingetPackage("Telegram Desktop", "Telegram.TelegramDesktop"),
+)
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class NpmPackage:
     name: str
     package_name: str
 
+NPM_PACKAGES: Tuple[NpmPackage, ...] = (
+    NpmPackage("Gemini CLI", "@google-ai/generativelanguage"),
+    NpmPackage("OpenAI CLI", "openai"),
+    NpmPackage("TypeScript", "typescript"),
+    NpmPackage("React CLI", "create-react-app"),
+    NpmPackage("Next.js CLI", "create-next-app"),
+    NpmPackage("Vue CLI", "@vue/cli"),
+    NpmPackage("Angular CLI", "@angular/cli"),
+    NpmPackage("Nodemon", "nodemon"),
+    NpmPackage("Live Server", "live-server"),
+    NpmPackage("HTTP Server", "http-server"),
+    NpmPackage("JSON Server", "json-server"),
+    NpmPackage("Concurrently", "concurrently"),
+    NpmPackage("ESLint", "eslint"),
+    NpmPackage("Prettier", "prettier"),
+    NpmPackage("JSHint", "jshint"),
+    NpmPackage("Standard", "standard"),
+    NpmPackage("Webpack CLI", "webpack-cli"),
+    NpmPackage("Vite", "vite"),
+    NpmPackage("Parcel", "parcel"),
+    NpmPackage("Rollup", "rollup"),
+    NpmPackage("Yarn", "yarn"),
+    NpmPackage("PNPM", "pnpm"),
+    NpmPackage("NPX", "npx"),
+    NpmPackage("NP", "np"),
+    NpmPackage("Semantic Release", "semantic-release"),
+    NpmPackage("Jest CLI", "jest"),
+    NpmPackage("Mocha", "mocha"),
+    NpmPackage("Cypress", "cypress"),
+    NpmPackage("Playwright", "playwright"),
+    NpmPackage("Lodash CLI", "lodash-cli"),
+    NpmPackage("Moment CLI", "moment"),
+    NpmPackage("Axios", "axios"),
+    NpmPackage("Chalk", "chalk"),
+    NpmPackage("Commander", "commander"),
+    NpmPackage("MongoDB Tools", "mongodb"),
+    NpmPackage("Prisma CLI", "prisma"),
+    NpmPackage("GraphQL CLI", "graphql-cli"),
+    NpmPackage("Apollo CLI", "@apollo/client"),
+    NpmPackage("Vercel CLI", "vercel"),
+    NpmPackage("Netlify CLI", "netlify-cli"),
+    NpmPackage("Firebase CLI", "firebase-tools"),
+    NpmPackage("Heroku CLI", "heroku"),
+    NpmPackage("JSDoc", "jsdoc"),
+    NpmPackage("Storybook CLI", "@storybook/cli"),
+    NpmPackage("Docusaurus", "@docusaurus/core"),
+    NpmPackage("Lighthouse CLI", "lighthouse"),
+    NpmPackage("Bundlephobia CLI", "bundlephobia"),
+    NpmPackage("Speed Test CLI", "speed-test"),
+)
+_NPM_PACKAGES_BY_NAME: Dict[str, NpmPackage] = {package.package_name: package for package in NPM_PACKAGES}
+
 class DevEnvInstaller:
-    def __init__(self):
-        self.winget_packages = [
-            WingetPackage("Visual Studio Code", "Microsoft.VisualStudioCode"),
-            WingetPackage("Oh My Posh", "JanDeDobbeleer.OhMyPosh"),
-            WingetPackage("JetBrainsMono Nerd Font", "Microsoft.NerdFonts.FiraCode"),
-            WingetPackage("Fastfetch", "Fastfetch-cli.Fastfetch"),
-            WingetPackage("Git", "Microsoft.Git"),
-            WingetPackage("Node.js", "OpenJS.NodeJS"),
-            WingetPackage("Docker Desktop", "Docker.DockerDesktop"),
-            WingetPackage("Google Chrome", "Google.Chrome"),
-            WingetPackage("Brave Browser", "Brave.Brave"),
-            WingetPackage("VirtualBox", "Oracle.VirtualBox"),
-            WingetPackage("Claude Desktop", "Anthropic.Claude"),
-            WingetPackage("PowerToys", "Microsoft.PowerToys"),
-            WingetPackage("Windows Terminal", "Microsoft.WindowsTerminal"),
-            WingetPackage("7-Zip", "7zip.7zip"),
-            WingetPackage("Postman", "Postman.Postman"),
-            WingetPackage("Discord", "Discord.Discord"),
-            WingetPackage("Slack", "SlackTechnologies.Slack"),
-            WingetPackage("Notion", "Notion.Notion"),
-            WingetPackage("OBS Studio", "OBSProject.OBSStudio"),
-            WingetPackage("VLC media player", "VideoLAN.VLC"),
-            WingetPackage("WhatsApp", "9NKSQGP7F2NH"),
-            WingetPackage("Telegram Desktop", "Telegram.TelegramDesktop"),
-        ]
-        self.npm_packages = [
-            NpmPackage("Gemini CLI", "@google-ai/generativelanguage"),
-            NpmPackage("OpenAI CLI", "openai"),
-            NpmPackage("TypeScript", "typescript"),
-            NpmPackage("React CLI", "create-react-app"),
-            NpmPackage("Next.js CLI", "create-next-app"),
-            NpmPackage("Vue CLI", "@vue/cli"),
-            NpmPackage("Angular CLI", "@angular/cli"),
-            NpmPackage("Nodemon", "nodemon"),
-            NpmPackage("Live Server", "live-server"),
-            NpmPackage("HTTP Server", "http-server"),
-            NpmPackage("JSON Server", "json-server"),
-            NpmPackage("Concurrently", "concurrently"),
-            NpmPackage("ESLint", "eslint"),
-            NpmPackage("Prettier", "prettier"),
-            NpmPackage("JSHint", "jshint"),
-            NpmPackage("Standard", "standard"),
-            NpmPackage("Webpack CLI", "webpack-cli"),
-            NpmPackage("Vite", "vite"),
-            NpmPackage("Parcel", "parcel"),
-            NpmPackage("Rollup", "rollup"),
-            NpmPackage("Yarn", "yarn"),
-            NpmPackage("PNPM", "pnpm"),
-            NpmPackage("NPX", "npx"),
-            NpmPackage("NP", "np"),
-            NpmPackage("Semantic Release", "semantic-release"),
-            NpmPackage("Jest CLI", "jest"),
-            NpmPackage("Mocha", "mocha"),
-            NpmPackage("Cypress", "cypress"),
-            NpmPackage("Playwright", "playwright"),
-            NpmPackage("Lodash CLI", "lodash-cli"),
-            NpmPackage("Moment CLI", "moment"),
-            NpmPackage("Axios", "axios"),
-            NpmPackage("Chalk", "chalk"),
-            NpmPackage("Commander", "commander"),
-            NpmPackage("MongoDB Tools", "mongodb"),
-            NpmPackage("Prisma CLI", "prisma"),
-            NpmPackage("GraphQL CLI", "graphql-cli"),
-            NpmPackage("Apollo CLI", "@apollo/client"),
-            NpmPackage("Vercel CLI", "vercel"),
-            NpmPackage("Netlify CLI", "netlify-cli"),
-            NpmPackage("Firebase CLI", "firebase-tools"),
-            NpmPackage("Heroku CLI", "heroku"),
-            NpmPackage("JSDoc", "jsdoc"),
-            NpmPackage("Storybook CLI", "@storybook/cli"),
-            NpmPackage("Docusaurus", "@docusaurus/core"),
-            NpmPackage("Lighthouse CLI", "lighthouse"),
-            NpmPackage("Bundlephobia CLI", "bundlephobia"),
-            NpmPackage("Speed Test CLI", "speed-test"),
-        ]
+    def __init__(self, parallel: int = NPM_DEFAULT_WORKERS, parallel_install: int = 1, batch_install: bool = True, winget_import: bool = False, refresh: bool = False, verbosity: int = 0):
+        self.parallel = max(1, parallel)
+        self.parallel_install = max(1, parallel_install)
+        self.batch_install = batch_install
+        self.winget_import = winget_import
+        self.refresh = refresh
+        # -1 (--quiet): only prompts, warnings and errors; 1 (--verbose): also per-package details
+        self.verbosity = verbosity
+        _load_rich()
+        self.winget_packages = WINGET_PACKAGES
+        self.npm_packages = NPM_PACKAGES
 
     def run(self):
-        console.print("[bold cyan]Development Environment Setup[/bold cyan]")
+        self._print("[bold cyan]Development Environment Setup[/bold cyan]")
         self.install_winget_packages()
         self.install_npm_packages()
-        console.print("[bold green]All installations complete![/bold green]")
+        self._print("[bold green]All installations complete![/bold green]")
+
+    def _print(self, message: str, level: int = 0):
+        # Warnings, errors and prompts bypass this and are always shown
+        if self.verbosity >= level:
+            console.print(message)
+
+    def _flush(self, output: List[str]):
+        # Success lines are left out of the output entirely under --quiet
+        if output:
+            console.print("\n".join(output))
 
     def install_winget_packages(self):
-        console.print("\n[bold blue]Installing Winget Packages...[/bold blue]")
-        if not self._check_command_available("winget", "--version"):
+        self._print("\n[bold blue]Installing Winget Packages...[/bold blue]")
+        winget = self._resolve_command("winget", "--version")
+        if winget is None:
             console.print("[bold red]Winget is not available. Please install it from the Microsoft Store.[/bold red]")
             return
+        self.winget_cmd, winget_version = winget
+        self._print(f"[dim]Using winget {winget_version}[/dim]", 1)
 
-        with console.status("[bold green]Processing winget packages...[/bold green]") as status:
-            for package in self.winget_packages:
-                status.update(f"[bold green]Processing {package.name}...[/bold green]")
-                self._install_winget_package(package)
+        self._load_winget_state()
+        installed_count = sum(package.winget_id_lc in self._winget_installed for package in self.winget_packages)
+        if installed_count and self.verbosity == 0:
+            self._print(f"[green]{installed_count} of {len(self.winget_packages)} winget packages are already installed (pass --verbose to list them).[/green]")
+        # Every upgrade question is asked up front, so the installs below run without interruptions
+        candidates = [(package, *self._winget_upgradable[package.winget_id_lc]) for package in self.winget_packages if package.winget_id_lc in self._winget_installed and package.winget_id_lc in self._winget_upgradable]
+        to_upgrade = self._select_upgrades(candidates)
+        try:
+            with _status("[bold green]Processing winget packages...[/bold green]", self.verbosity < 0) as status:
+                # Installer output is only mirrored into a live spinner; piped output gets just the result lines
+                progress = status if console.is_terminal else None
+                packages = self.winget_packages
+                missing = [package for package in packages if package.winget_id_lc not in self._winget_installed]
+                # Opt-in because import has no --silent; a single package gains nothing from the round-trip
+                if self.winget_import and len(missing) > 1:
+                    status.update(f"[bold green]Importing {len(missing)} winget packages...[/bold green]")
+                    remaining = self._run_winget_import(missing, progress)
+                    packages = [package for package in packages if package not in missing or package in remaining]
+                # Store installs go through a separate pipeline and are kept serial as well
+                concurrent = [package for package in packages if self.parallel_install > 1 and package.winget_id_lc not in self._winget_installed and package.winget_id not in WINGET_SERIAL_ONLY and package.source == "winget"]
+                for package in packages:
+                    if package in concurrent:
+                        continue
+                    status.update(f"[bold green]Processing {package.name}...[/bold green]")
+                    self._install_winget_package(package, package in to_upgrade, progress)
+                if concurrent:
+                    status.update(f"[bold green]Installing {len(concurrent)} winget packages in parallel...[/bold green]")
+                    self._install_winget_packages_concurrently(concurrent)
+        finally:
+            self._save_winget_state()
 
-    def _install_winget_package(self, package: WingetPackage):
+    def _install_winget_package(self, package: WingetPackage, upgrade: bool = False, progress=None):
         try:
-            list_result = subprocess.run(["winget", "list", "--id", package.winget_id, "--exact"], capture_output=True, text=True)
-            if list_result.returncode == 0 and package.winget_id in list_result.stdout:
-                console.print(f"[green]{package.name} is already installed.[/green]")
-                upgrade_result = subprocess.run(["winget", "upgrade", "--id", package.winget_id, "--exact"], capture_output=True, text=True)
-                if upgrade_result.returncode == 0 and package.winget_id in upgrade_result.stdout:
-                    if Confirm.ask(f"[yellow]An update is available for {package.name}. Do you want to update?[/yellow]"):
-                        self._run_command(["winget", "upgrade", "--id", package.winget_id, "--exact", "--accept-source-agreements", "--accept-package-agreements", "--silent"], f"Upgrading {package.name}")
+            if package.winget_id_lc in self._winget_installed:
+                self._print(f"[green]{package.name} is already installed.[/green]", 1)
+                # The upgrade scan includes packages of unknown version, so the upgrade itself has to as well
+                if upgrade and self._run_command([self.winget_cmd, "upgrade", "--id", package.winget_id, "--include-unknown", *WINGET_INSTALL_FLAGS], f"Upgrading {package.name}", progress, INSTALL_TIMEOUT):
+                    self._record_winget_success(package)
                 return
 
-            self._run_command(["winget", "install", "--id", package.winget_id, "--exact", "--accept-source-agreements", "--accept-package-agreements", "--silent"], f"Installing {package.name}")
+            self._flush(self._install_missing_winget_package(package, progress)[1])
         except Exception as e:
             console.print(f"[bold red]Error processing {package.name}: {e}[/bold red]")
 
+    def _install_missing_winget_package(self, package: WingetPackage, progress=None) -> Tuple[Optional[int], List[str]]:
+        # No separate 'winget search' check: an unknown ID already fails the install with a distinct exit code
+        returncode, output = self._execute_command([self.winget_cmd, "install", "--id", package.winget_id, *WINGET_INSTALL_FLAGS], f"Installing {package.name}", progress, INSTALL_TIMEOUT)
+        if returncode == 0:
+            self._record_winget_success(package)
+        elif _hresult(returncode) == WINGET_NO_APPLICATIONS_FOUND:
+            output = [f"[bold red]  -> Installing {package.name} - Not found! No winget package matches the ID {package.winget_id}.[/bold red]"]
+        return returncode, output
+
+    def _install_winget_packages_concurrently(self, packages: List[WingetPackage]):
+        # Same shape as the npm fallback: installs overlap their downloads, output is flushed per package
+        busy: List[WingetPackage] = []
+        with ThreadPoolExecutor(max_workers=min(self.parallel_install, len(packages))) as executor:
+            futures = {executor.submit(self._install_missing_winget_package, package): package for package in packages}
+            for future in as_completed(futures):
+                package = futures[future]
+                try:
+                    returncode, output = future.result()
+                except Exception as e:
+                    returncode, output = None, [f"[bold red]Error processing {package.name}: {e}[/bold red]"]
+                if _hresult(returncode) in WINGET_INSTALL_IN_PROGRESS:
+                    busy.append(package)
+                    continue
+                self._flush(output)
+
+        if busy:
+            console.print(f"[yellow]  -> {len(busy)} package(s) collided with another installer; retrying them one at a time...[/yellow]")
+        for package in busy:
+            self._install_winget_package(package)
+
+    def _run_winget_import(self, packages: List[WingetPackage], progress=None) -> List[WingetPackage]:
+        # Returns the packages that still need to be installed one by one
+        sources = {}
+        for package in packages:
+            sources.setdefault(package.source, []).append({"PackageIdentifier": package.winget_id})
+        manifest = {
+            "$schema": "https://aka.ms/winget-packages.schema.2.0.json",
+            "Sources": [{"Packages": entries, "SourceDetails": WINGET_SOURCE_DETAILS[source]} for source, entries in sources.items()],
+        }
+        fd, manifest_path = tempfile.mkstemp(prefix="windev-setup-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            # import has no --silent; each installer runs in its default mode
+            command = [self.winget_cmd, "import", "--import-file", manifest_path, "--ignore-unavailable", "--ignore-versions", "--no-upgrade", "--accept-package-agreements", "--accept-source-agreements", "--disable-interactivity"]
+            try:
+                returncode, tail = self._stream_command(command, min(INSTALL_TIMEOUT * len(packages), WINGET_IMPORT_TIMEOUT), self._progress_updater(progress, "Importing winget packages"))
+            except subprocess.TimeoutExpired:
+                console.print("[yellow]  -> winget import timed out; checking what it managed to install...[/yellow]")
+            else:
+                # Shows why when nothing went in at all, e.g. a rejected manifest or a winget without import
+                if returncode != 0:
+                    details = "".join(tail).rstrip()
+                    console.print(f"[yellow]  -> winget import exited with code {returncode}{':' if details else '.'}[/yellow]" + (f"\n{escape(details)}" if details else ""))
+        finally:
+            os.remove(manifest_path)
+
+        # The exit code only says whether everything went through; a fresh list shows what actually did
+        installed = {row[1].casefold() for row in self._scan_winget_table("list")[1]}
+        done = [package for package in packages if package.winget_id_lc in installed]
+        for package in done:
+            self._record_winget_success(package)
+        if done:
+            self._print("\n".join(f"[green]  -> Installing {package.name} - Success![/green]" for package in done))
+        remaining = [package for package in packages if package not in done]
+        if remaining:
+            console.print(f"[yellow]  -> winget import left {len(remaining)} package(s) uninstalled; installing them individually...[/yellow]")
+        return remaining
+
+    def _load_winget_state(self):
+        cached = None if self.refresh else _read_cache(WINGET_STATE_CACHE, WINGET_STATE_TTL)
+        if cached is not None and cached.get("winget") == self.winget_cmd:
+            self._print("[dim]Using cached winget package state (pass --refresh to rescan).[/dim]")
+            self._winget_state_timestamp = cached["timestamp"]
+            self._winget_state_trusted = True
+            self._winget_installed = cached["installed"]
+            self._winget_upgradable = cached["upgradable"]
+            return
+
+        # One 'winget list' and one 'winget upgrade' scan up front instead of both per package;
+        # neither depends on the other, so they run concurrently
+        self._winget_state_timestamp = time.time()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            installed_future = executor.submit(self._scan_winget_table, "list")
+            upgradable_future = executor.submit(self._scan_winget_table, "upgrade", "--include-unknown")
+            installed_code, installed_rows = installed_future.result()
+            upgradable_code, upgradable_rows = upgradable_future.result()
+        # A failed scan (e.g. offline) leaves an empty or partial table; use it for this run but don't cache it
+        self._winget_state_trusted = _hresult(installed_code) in WINGET_SCAN_OK and _hresult(upgradable_code) in WINGET_SCAN_OK
+        if not self._winget_state_trusted:
+            console.print(f"[yellow]winget list/upgrade scan failed (exit codes {installed_code}/{upgradable_code}); the package state may be incomplete and is not cached.[/yellow]")
+
+        # Keyed by casefolded Id because winget matches IDs case-insensitively
+        self._winget_installed: Dict[str, str] = {row[1].casefold(): row[2] for row in installed_rows if len(row) > 2}
+        self._winget_upgradable: Dict[str, Tuple[str, str]] = {row[1].casefold(): (row[2], row[3]) for row in upgradable_rows if len(row) > 3}
+        self._save_winget_state()
+
+    def _save_winget_state(self):
+        if not self._winget_state_trusted:
+            return
+        _write_cache(WINGET_STATE_CACHE, {
+            "timestamp": self._winget_state_timestamp,
+            "winget": self.winget_cmd,
+            "installed": self._winget_installed,
+            "upgradable": self._winget_upgradable,
+        })
+
+    def _record_winget_success(self, package: WingetPackage):
+        # Same idea as _record_npm_success: the cached snapshot follows what this run installed
+        _, available = self._winget_upgradable.pop(package.winget_id_lc, (None, None))
+        self._winget_installed[package.winget_id_lc] = available or "Unknown"
+
+    def _scan_winget_table(self, *args: str) -> Tuple[int, List[List[str]]]:
+        # Rows are matched on the exact Id column later; a substring test on the raw output lets
+        # Microsoft.Git match Microsoft.GitHub.CLI
+        result = subprocess.run([self.winget_cmd, *args, "--accept-source-agreements"], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, encoding="utf-8", errors="replace", creationflags=_NO_WINDOW)
+        # Trailer text such as "2 upgrades available." also lands in the table; real IDs never contain spaces
+        return result.returncode, [row for row in _parse_winget_table(result.stdout) if len(row) > 1 and row[1] and " " not in row[1]]
+
     def install_npm_packages(self):
-        console.print("\n[bold blue]Installing NPM Packages...[/bold blue]")
-        if not self._check_command_available("npm", "--version"):
+        self._print("\n[bold blue]Installing NPM Packages...[/bold blue]")
+        npm = self._resolve_command("npm", "--version")
+        if npm is None and self._refresh_path():
+            # Node.js may have been installed by the winget phase moments ago
+            self._resolve_command.cache_clear()
+            npm = self._resolve_command("npm", "--version")
+        if npm is None:
             console.print("[bold red]NPM is not available. Please install Node.js first.[/bold red]")
             return
+        self.npm_cmd, npm_version = npm
+        self._print(f"[dim]Using npm {npm_version}[/dim]", 1)
+
+        self._load_npm_state()
+        to_install = [package for package in self.npm_packages if package.package_name not in self._npm_installed]
+        installed = [package for package in self.npm_packages if package.package_name in self._npm_installed]
+        if installed and self.verbosity > 0:
+            console.print("\n".join(f"[green]{package.name} is already installed.[/green]" for package in installed))
+        elif installed:
+            self._print(f"[green]{len(installed)} of {len(self.npm_packages)} npm packages are already installed (pass --verbose to list them).[/green]")
 
-        with console.status("[bold green]Processing npm packages...[/bold green]") as status:
-            for package in self.npm_packages:
-                status.update(f"[bold green]Processing {package.name}...[/bold green]")
-                self._install_npm_package(package)
+        # Prompts happen here, before dispatch, so no worker thread ever waits on user input
+        candidates = [(package, self._npm_outdated[package.package_name].get("current"), self._npm_outdated[package.package_name].get("latest")) for package in installed if package.package_name in self._npm_outdated]
+        to_upgrade: List[NpmPackage] = self._select_upgrades(candidates)
+
+        if not to_install and not to_upgrade:
+            return
 
-    def _install_npm_package(self, package: NpmPackage):
         try:
-            list_result = subprocess.run(["npm", "list", "-g", package.package_name], capture_output=True, text=True)
-            if list_result.returncode == 0 and package.package_name in list_result.stdout:
-                console.print(f"[green]{package.name} is already installed.[/green]")
-                outdated_result = subprocess.run(["npm", "outdated", "-g", package.package_name], capture_output=True, text=True)
-                if outdated_result.returncode == 0 and package.package_name in outdated_result.stdout:
-                    if Confirm.ask(f"[yellow]An update is available for {package.name}. Do you want to update?[/yellow]"):
-                        self._run_command(["npm", "update", "-g", package.package_name], f"Upgrading {package.name}")
-                return
+            with _status("[bold green]Processing npm packages...[/bold green]", self.verbosity < 0):
+                self._process_npm_packages(to_install, to_upgrade)
+        finally:
+            self._save_npm_state()
 
-            self._run_command(["npm", "install", "-g", package.package_name], f"Installing {package.name}")
-        except Exception as e:
-            console.print(f"[bold red]Error processing {package.name}: {e}[/bold red]")
+    def _select_upgrades(self, candidates: List[Tuple]) -> List:
+        # candidates are (package, current version, available version); one question covers all of them
+        if not candidates:
+            return []
+        if len(candidates) == 1:
+            package, current, available = candidates[0]
+            return [package] if Confirm.ask(f"[yellow]An update is available for {package.name} ({current} -> {available}). Do you want to update?[/yellow]") else []
+
+        console.print(f"[yellow]Updates are available for {len(candidates)} packages:[/yellow]")
+        console.print("\n".join(f"  {number}. {package.name} ({current} -> {available})" for number, (package, current, available) in enumerate(candidates, 1)))
+        choice = Prompt.ask("[yellow]Update all of them? (s = choose one by one)[/yellow]", choices=["y", "n", "s"], default="y")
+        if choice == "y":
+            return [package for package, _, _ in candidates]
+        if choice == "n":
+            return []
+        return [package for package, current, available in candidates if Confirm.ask(f"[yellow]Update {package.name} ({current} -> {available})?[/yellow]")]
+
+    def _process_npm_packages(self, to_install: List[NpmPackage], to_upgrade: List[NpmPackage]):
+        # Batch first; only what a failed batch leaves behind goes through the per-package path. A single
+        # package would only run the same command twice on failure, so it goes straight to that path.
+        if self.batch_install and len(to_install) > 1:
+            to_install = self._run_npm_batch("install", to_install, "Installing")
+        if self.batch_install and len(to_upgrade) > 1:
+            to_upgrade = self._run_npm_batch("update", to_upgrade, "Upgrading")
+
+        tasks = [(package, [self.npm_cmd, "install", "-g", package.package_name], f"Installing {package.name}") for package in to_install]
+        tasks += [(package, [self.npm_cmd, "update", "-g", package.package_name], f"Upgrading {package.name}") for package in to_upgrade]
+        if not tasks:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.parallel, len(tasks))) as executor:
+            futures = {executor.submit(self._execute_command, command, description, None, INSTALL_TIMEOUT): package for package, command, description in tasks}
+            for future in as_completed(futures):
+                package = futures[future]
+                try:
+                    returncode, output = future.result()
+                except Exception as e:
+                    returncode, output = None, [f"[bold red]Error processing {package.name}: {e}[/bold red]"]
+                if returncode == 0:
+                    self._record_npm_success(package)
+                # One write per package keeps its status and error tail together
+                self._flush(output)
 
-    def _check_command_available(self, command: str, version_arg: str) -> bool:
+    def _run_npm_batch(self, action: str, packages: List[NpmPackage], verb: str) -> List[NpmPackage]:
+        # Returns the packages that still need to be handled one by one
+        names = [package.package_name for package in packages]
         try:
-            subprocess.run([command, version_arg], capture_output=True, text=True, check=True)
-            return True
-        except (FileNotFoundError, subprocess.CalledProcessError):
+            returncode, tail = self._stream_command([self.npm_cmd, action, "-g", *names], timeout=INSTALL_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            console.print(f"[yellow]  -> Batch npm {action} timed out; retrying packages individually...[/yellow]")
+            return packages
+
+        if returncode == 0:
+            for package in packages:
+                self._record_npm_success(package)
+            self._print("\n".join(f"[green]  -> {verb} {package.name} - Success![/green]" for package in packages))
+            return []
+
+        # npm rolls the whole batch back on error, so everything is retried; the culprits are only reported
+        culprits = {match.group(1) for match in _NPM_ERROR_RE.finditer("".join(tail))} & set(names)
+        reason = ", ".join(sorted(_NPM_PACKAGES_BY_NAME[name].name for name in culprits)) if culprits else "see per-package results"
+        console.print(f"[yellow]  -> Batch npm {action} failed ({reason}); retrying packages individually...[/yellow]")
+        return packages
+
+    def _load_npm_state(self):
+        cached = None if self.refresh else _read_cache(NPM_STATE_CACHE, NPM_STATE_TTL)
+        # Snapshots written before failed scans were rejected may hold npm's error object as the outdated map
+        if cached is not None and cached.get("npm") == self.npm_cmd and "error" not in cached.get("outdated", {}):
+            self._print("[dim]Using cached npm package state (pass --refresh to rescan).[/dim]")
+            self._npm_state_timestamp = cached["timestamp"]
+            self._npm_state_trusted = True
+            self._npm_installed = cached["installed"]
+            self._npm_outdated = cached["outdated"]
+            return
+
+        # One global listing and one outdated check up front instead of two npm spawns per package.
+        # The two are independent, so they run side by side; npm outdated exits with 1 whenever
+        # something is outdated, so only its output matters.
+        self._npm_state_timestamp = time.time()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            ls_future = executor.submit(self._query_npm, "ls", "-g", "--depth=0", "--json")
+            outdated_future = executor.submit(self._query_npm, "outdated", "-g", "--json")
+            installed = self._parse_npm_json(ls_future.result())
+            outdated = self._parse_npm_json(outdated_future.result())
+        # State pieced together from the text fallback is good enough for this run, but it may come from a
+        # failed scan (e.g. an unreachable registry), so it is never cached
+        self._npm_state_trusted = installed is not None and outdated is not None
+
+        if installed is not None:
+            self._npm_installed = {name: meta.get("version") for name, meta in installed.get("dependencies", {}).items()}
+        else:
+            output = self._query_npm("ls", "-g", "--depth=0").decode(errors="replace")
+            self._npm_installed = {match.group(1): match.group(2) for match in _NPM_LS_RE.finditer(output)}
+
+        if outdated is not None:
+            self._npm_outdated = outdated
+        else:
+            output = self._query_npm("outdated", "-g").decode(errors="replace")
+            self._npm_outdated = {
+                match.group(1): {"current": match.group(2), "wanted": match.group(3), "latest": match.group(4)}
+                for match in _NPM_OUTDATED_RE.finditer(output)
+                if match.group(1) != "Package"
+            }
+        self._save_npm_state()
+
+    def _save_npm_state(self):
+        if not self._npm_state_trusted:
+            return
+        _write_cache(NPM_STATE_CACHE, {
+            "timestamp": self._npm_state_timestamp,
+            "npm": self.npm_cmd,
+            "installed": self._npm_installed,
+            "outdated": self._npm_outdated,
+        })
+
+    def _record_npm_success(self, package: NpmPackage):
+        # Keep the cached state truthful without rescanning: the package is now present and current
+        outdated = self._npm_outdated.pop(package.package_name, {})
+        self._npm_installed[package.package_name] = outdated.get("latest")
+
+    def _query_npm(self, *args: str) -> bytes:
+        # Both orjson and json accept bytes, so npm output is captured without text=True
+        return subprocess.run([self.npm_cmd, *args], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, creationflags=_NO_WINDOW).stdout
+
+    def _parse_npm_json(self, output: bytes) -> Optional[Dict]:
+        try:
+            data = _json.loads(output or b"{}")
+        except ValueError:
+            console.print("[yellow]Could not parse npm JSON output; falling back to the plain-text listing.[/yellow]")
+            return None
+        if not isinstance(data, dict):
+            return None
+        # A failed --json command still prints an object, just one with an "error" member. ELSPROBLEMS from ls
+        # (extraneous or invalid packages) comes with the full dependency tree, so that listing is still usable.
+        error = data.get("error")
+        if error is not None and not (isinstance(error, dict) and error.get("code") == "ELSPROBLEMS" and "dependencies" in data):
+            code = error.get("code") if isinstance(error, dict) else None
+            console.print(f"[yellow]npm reported an error ({code or 'unknown'}); falling back to the plain-text listing.[/yellow]")
+            return None
+        return data
+
+    def _refresh_path(self) -> bool:
+        # Installers only update PATH in the registry; merge it in instead of waiting for a new shell
+        if sys.platform != "win32":
+            return False
+        import winreg
+
+        paths = []
+        for root, key in ((winreg.HKEY_LOCAL_MACHINE, r"SYSTEM\CurrentControlSet\Control\Session Manager\Environment"), (winreg.HKEY_CURRENT_USER, "Environment")):
+            try:
+                with winreg.OpenKey(root, key) as handle:
+                    paths.append(os.path.expandvars(winreg.QueryValueEx(handle, "Path")[0]))
+            except OSError:
+                continue
+        if not paths:
             return False
+        os.environ["PATH"] = os.pathsep.join([*paths, os.environ.get("PATH", "")])
+        return True
 
-    def _run_command(self, command: List[str], description: str):
-        # No need to print description here as the status takes care of it
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _resolve_command(command: str, version_arg: str) -> Optional[Tuple[str, str]]:
+        # Returns (executable, version) or None; shutil.which also finds shims such as npm.cmd on Windows
+        env = _read_cache("env.json", ENV_CACHE_TTL) or {"timestamp": time.time(), "commands": {}}
+        cached = env["commands"].get(command)
+        if cached and os.path.exists(cached["path"]):
+            return cached["path"], cached["version"]
+
+        path = shutil.which(command)
+        if path is None:
+            return None
         try:
-            result = subprocess.run(command, capture_output=True, text=True, check=True)
-            console.print(f"[green]  -> {description} - Success![/green]")
-        except subprocess.CalledProcessError as e:
-            console.print(f"[bold red]  -> {description} - Failed![/bold red]")
-            console.print(e.stderr)
+            result = subprocess.run([path, version_arg], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, creationflags=_NO_WINDOW)
+        except OSError:
+            return None
+        if result.returncode != 0:
+            return None
+
+        version = result.stdout.strip()
+        # Only successful probes are persisted so a freshly installed tool is picked up on the next run
+        env["commands"][command] = {"path": path, "version": version}
+        _write_cache("env.json", env)
+        return path, version
+
+    def _run_command(self, command: List[str], description: str, progress=None, timeout: Optional[float] = None) -> bool:
+        returncode, output = self._execute_command(command, description, progress, timeout)
+        self._flush(output)
+        return returncode == 0
+
+    def _execute_command(self, command: List[str], description: str, progress=None, timeout: Optional[float] = None) -> Tuple[Optional[int], List[str]]:
+        # Output is returned rather than printed so concurrent callers can flush it per package;
+        # the exit code is None when the command timed out
+        try:
+            returncode, tail = self._stream_command(command, timeout, self._progress_updater(progress, description))
+        except subprocess.TimeoutExpired:
+            return None, [f"[bold red]  -> {description} - Timed out after {timeout:.0f} seconds![/bold red]"]
+        if returncode == 0:
+            return 0, [f"[green]  -> {description} - Success![/green]"] if self.verbosity >= 0 else []
+        output = [f"[bold red]  -> {description} - Failed![/bold red]"]
+        details = "".join(tail).rstrip()
+        if details:
+            output.append(escape(details))
+        return returncode, output
+
+    @staticmethod
+    def _progress_updater(progress, description: str):
+        if progress is None:
+            return None
+        return lambda line: progress.update(f"[bold green]{description}...[/bold green] [dim]{escape(line)}[/dim]")
+
+    def _stream_command(self, command: List[str], timeout: Optional[float] = None, on_line=None) -> Tuple[int, Deque[str]]:
+        # Installers can print megabytes of progress; a reader thread drains it as it arrives so the pipe
+        # never fills up, and the main thread stays free to enforce the timeout
+        tail: Deque[str] = deque(maxlen=OUTPUT_TAIL_LINES)
+        proc = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8", errors="replace", bufsize=1)
+        reader = threading.Thread(target=self._drain_output, args=(proc.stdout, tail, on_line), daemon=True)
+        reader.start()
+        try:
+            returncode = proc.wait(timeout=timeout)
+        except BaseException:
+            # Timeout or Ctrl+C: never leave the installer running behind our back. Not joined: a
+            # grandchild (e.g. msiexec) may still hold the pipe open after the kill
+            proc.kill()
+            proc.wait()
+            raise
+        # The same can happen after a normal exit, so the reader only gets a grace period to finish
+        reader.join(timeout=READER_GRACE_PERIOD)
+        if reader.is_alive():
+            # Hand back a snapshot; the still-running reader keeps appending to its own deque
+            return returncode, deque(tail, maxlen=OUTPUT_TAIL_LINES)
+        return returncode, tail
+
+    @staticmethod
+    def _drain_output(stream, tail: Deque[str], on_line=None):
+        with stream:
+            for line in stream:
+                text = line.strip()
+                # winget's spinner frames end up as one-character lines; they carry nothing worth keeping
+                if len(text) <= 1:
+                    continue
+                tail.append(line)
+                if on_line is not None:
+                    on_line(text)
+
+def main():
+    parser = argparse.ArgumentParser(description="Install the curated winget and npm development tools.")
+    parser.add_argument("--parallel", type=int, default=NPM_DEFAULT_WORKERS, metavar="N", help=f"number of concurrent per-package npm installs (default: {NPM_DEFAULT_WORKERS}); values above 1 can race on the global prefix")
+    parser.add_argument("--parallel-install", type=int, default=1, metavar="N", help="number of concurrent winget installs (default: 1); a few conflict-prone packages always install alone")
+    parser.add_argument("--batch-install", action=argparse.BooleanOptionalAction, default=True, help="install missing npm packages with a single npm command (default: on)")
+    parser.add_argument("--winget-import", action="store_true", help="install missing winget packages with a single 'winget import' (installers then run without --silent)")
+    parser.add_argument("--refresh", action="store_true", help="ignore the cached winget and npm package state and rescan")
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument("-q", "--quiet", dest="verbosity", action="store_const", const=-1, default=0, help="only show prompts, warnings and errors")
+    verbosity.add_argument("-v", "--verbose", dest="verbosity", action="store_const", const=1, help="also list already installed packages and the tools in use")
+    args = parser.parse_args()
+
+    installer = DevEnvInstaller(**vars(args))
+    installer.run()
 
 if __name__ == "__main__":
-    installer = DevEnvInstaller()
-    installer.run()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -3,12 +3,69 @@
 This script configures fastfetch in the same way as the provided PowerShell script.
 It creates the necessary configuration files and updates the PowerShell profile.
 '''
+import json
 import os
 import subprocess
 import sys
+from functools import lru_cache
+from pathlib import Path
 
+def write_if_changed(path, content, encoding='utf-8'):
+    """Writes content to path unless the file already holds that text. Returns True if it wrote."""
+    # Text mode on both sides: newlines stay in the platform's style (CRLF on Windows) and compare equal
+    try:
+        if path.read_text(encoding=encoding) == content:
+            return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    path.write_text(content, encoding=encoding)
+    return True
+
+def get_file_stamp(path):
+    """Returns a cheap fingerprint (path, mtime, size) of a file, or None if it doesn't exist."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return f"{path}|{stat.st_mtime_ns}:{stat.st_size}"
+
+def update_powershell_profile(profile_path, profile_content_to_add):
+    """Prepends the fastfetch block to the profile unless it's already there."""
+    try:
+        existing_content = profile_path.read_text(encoding='utf-8-sig')
+    except FileNotFoundError:
+        existing_content = ''
+        print("No existing profile found; a new one will be created.")
+    except UnicodeDecodeError:
+        existing_content = profile_path.read_text(encoding='utf-8')
+
+    if 'fastfetch -c' not in existing_content:
+        print("Adding fastfetch command to profile.")
+        new_content = profile_content_to_add + '\n\n' + existing_content
+        write_if_changed(profile_path, new_content, encoding='utf-8-sig')
+        print("Successfully updated PowerShell profile.")
+    else:
+        print("Fastfetch command already found in PowerShell profile. No changes made.")
+
+def get_documents_dir():
+    """Reads the Documents folder (which may be redirected, e.g. to OneDrive) from the registry."""
+    try:
+        import winreg
+        key_path = r"Software\Microsoft\Windows\CurrentVersion\Explorer\User Shell Folders"
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path) as key:
+            return os.path.expandvars(winreg.QueryValueEx(key, "Personal")[0])
+    except (ImportError, OSError):
+        return None
+
+@lru_cache(maxsize=1)
 def get_powershell_profile_path():
-    """Determines the PowerShell profile path by executing a PowerShell command."""
+    """Determines the PowerShell profile path, only executing PowerShell if it can't be derived directly."""
+    # $PROFILE for Windows PowerShell is <Documents>\WindowsPowerShell\Microsoft.PowerShell_profile.ps1;
+    # computing it skips a powershell.exe cold start
+    documents_dir = get_documents_dir()
+    if documents_dir and os.path.isdir(documents_dir):
+        return os.path.join(documents_dir, "WindowsPowerShell", "Microsoft.PowerShell_profile.ps1")
+
     command = "Write-Output $PROFILE"
     try:
         # Execute the command using powershell.exe
@@ -16,32 +73,34 @@ def get_powershell_profile_path():
             ["powershell", "-NoProfile", "-Command", command],
             capture_output=True,
             text=True,
-            check=True,
             encoding='utf-8'
         )
-        profile_path = result.stdout.strip()
-        if not profile_path:
-            raise ValueError("PowerShell command returned an empty profile path.")
-        return profile_path
-    except (subprocess.CalledProcessError, FileNotFoundError, ValueError) as e:
+    except FileNotFoundError as e:
         print(f"Error getting PowerShell profile path: {e}", file=sys.stderr)
-        # Fallback to a common default if PowerShell isn't found or fails
-        print("Falling back to a default profile path.", file=sys.stderr)
-        return os.path.join(os.path.expanduser('~'), "Documents", "WindowsPowerShell", "Microsoft.PowerShell_profile.ps1")
+    else:
+        profile_path = result.stdout.strip()
+        if result.returncode == 0 and profile_path:
+            return profile_path
+        if result.returncode != 0:
+            print(f"Error getting PowerShell profile path: powershell exited with code {result.returncode}.", file=sys.stderr)
+        else:
+            print("Error getting PowerShell profile path: PowerShell command returned an empty profile path.", file=sys.stderr)
+    # Fallback to a common default if PowerShell isn't found or fails
+    print("Falling back to a default profile path.", file=sys.stderr)
+    return os.path.join(os.path.expanduser('~'), "Documents", "WindowsPowerShell", "Microsoft.PowerShell_profile.ps1")
 
 def main():
     """Main function to set up fastfetch configuration."""
     print("Starting fastfetch configuration setup...")
 
     # 1. Define paths
-    user_home = os.path.expanduser('~')
-    config_dir = os.path.join(user_home, '.config', 'fastfetch')
-    ascii_path = os.path.join(config_dir, 'ascii.txt')
-    json_config_path = os.path.join(config_dir, 'config.jsonc')
+    config_dir = Path.home() / '.config' / 'fastfetch'
+    ascii_path = config_dir / 'ascii.txt'
+    json_config_path = config_dir / 'config.jsonc'
 
     # 2. Create the configuration directory
     print(f"Ensuring configuration directory exists: {config_dir}")
-    os.makedirs(config_dir, exist_ok=True)
+    config_dir.mkdir(parents=True, exist_ok=True)
 
     # 3. Create ascii.txt
     print(f"Creating ASCII file: {ascii_path}")
@@ -65,101 +124,59 @@ $8 ⠀⠃⢸⣿⡇⠀⢠⣾⡇⢸⡇⠀⠀⠀⡞
 $9 ⠀⠀⠈⢿⡇⡰⠋⠈⠙⠂⠙⠢
 $9 ⠀⠀⠀⠈⢧
 '''.strip()
-    with open(ascii_path, 'w', encoding='utf-8') as f:
-        f.write(ascii_content)
-    print("ASCII file created.")
+    if write_if_changed(ascii_path, ascii_content):
+        print("ASCII file created.")
+    else:
+        print("ASCII file already up to date.")
 
     # 4. Create config.jsonc
     print(f"Creating JSON config file: {json_config_path}")
-    ascii_path_for_json = ascii_path.replace('\\', '/')
-    json_content = f'''
-{{
-  "$schema": "https://github.com/fastfetch-cli/fastfetch/raw/dev/doc/json_schema.json",
-  "logo": {{
-    "type": "file",
-    "source": "{ascii_path_for_json}",
-    "color": {{
-      "1": "#F5E0DC",
-      "2": "#F2CDCD",
-      "3": "#F5C2E7",
-      "4": "#FAB387",
-      "5": "#F9E2AF",
-      "6": "#A6E3A1",
-      "7": "#94E2D5",
-      "8": "#89DCEB",
-      "9": "#74C7EC"
-    }},
-    "padding": {{
-      "top": 1,
-      "right": 3
-    }}
-  }},
-  "display": {{
-    "separator": " "
-  }},
-  "modules": [
-    "break",
-    {{
-      "type": "title",
-      "color": {{
-        "user": "#F5E0DC",
-        "at": "#CDD6F4",
-        "host": "#89DCEB"
-      }}
-    }},
-    "break",
-    {{
-      "type": "os",
-      "key": "",
-      "keyColor": "#89DCEB"
-    }},
-    {{
-      "type": "cpu",
-      "key": "",
-      "keyColor": "#F5C2E7"
-    }},
-    {{
-      "type": "board",
-      "key": "󰚗",
-      "keyColor": "#FAB387"
-    }},
-    {{
-      "type": "memory",
-      "key": "",
-      "keyColor": "#A6E3A1",
-      "format": "{{used}} / {{total}} ({{percentage}})"
-    }},
-    {{
-      "type": "disk",
-      "key": "",
-      "keyColor": "#94E2D5"
-    }},
-    "break",
-    {{
-      "type": "colors",
-      "symbol": "circle"
-    }}
-  ]
-}}
-'''.strip()
-    with open(json_config_path, 'w', encoding='utf-8') as f:
-        f.write(json_content)
-    print("JSON config file created.")
+    config = {
+        "$schema": "https://github.com/fastfetch-cli/fastfetch/raw/dev/doc/json_schema.json",
+        "logo": {
+            "type": "file",
+            "source": ascii_path.as_posix(),
+            "color": {
+                "1": "#F5E0DC",
+                "2": "#F2CDCD",
+                "3": "#F5C2E7",
+                "4": "#FAB387",
+                "5": "#F9E2AF",
+                "6": "#A6E3A1",
+                "7": "#94E2D5",
+                "8": "#89DCEB",
+                "9": "#74C7EC",
+            },
+            "padding": {"top": 1, "right": 3},
+        },
+        "display": {"separator": " "},
+        "modules": [
+            "break",
+            {"type": "title", "color": {"user": "#F5E0DC", "at": "#CDD6F4", "host": "#89DCEB"}},
+            "break",
+            {"type": "os", "key": "", "keyColor": "#89DCEB"},
+            {"type": "cpu", "key": "", "keyColor": "#F5C2E7"},
+            {"type": "board", "key": "󰚗", "keyColor": "#FAB387"},
+            {"type": "memory", "key": "", "keyColor": "#A6E3A1", "format": "{used} / {total} ({percentage})"},
+            {"type": "disk", "key": "", "keyColor": "#94E2D5"},
+            "break",
+            {"type": "colors", "symbol": "circle"},
+        ],
+    }
+    # ensure_ascii=False keeps the Nerd Font key glyphs readable in the written file
+    json_content = json.dumps(config, indent=2, ensure_ascii=False)
+    if write_if_changed(json_config_path, json_content):
+        print("JSON config file created.")
+    else:
+        print("JSON config file already up to date.")
 
     # 5. Update PowerShell profile
     print("Updating PowerShell profile...")
-    profile_path = get_powershell_profile_path()
+    profile_path = Path(get_powershell_profile_path())
     print(f"Found PowerShell profile at: {profile_path}")
+    profile_path.parent.mkdir(parents=True, exist_ok=True)
 
-    profile_dir = os.path.dirname(profile_path)
-    os.makedirs(profile_dir, exist_ok=True)
-
-    if not os.path.exists(profile_path):
-        with open(profile_path, 'w', encoding='utf-8-sig') as f:
-            f.write('')
-        print("Created new, empty profile file.")
-
-    fastfetch_config_path_for_ps = json_config_path.replace('\\', '/')
+    fastfetch_config_path_for_ps = json_config_path.as_posix()
     profile_content_to_add = f'''
 # Minimal profile: UTF‑8 + Oh My Posh (if installed) + Fastfetch with explicit config path
 try {{
@@ -178,21 +195,19 @@ if (Get-Command fastfetch -ErrorAction SilentlyContinue) {{
 oh-my-posh init pwsh | Invoke-Expression
 '''.strip()
 
+    # The stamp records the profile as it was right after the last successful check, so an
+    # untouched profile doesn't need to be read again
+    stamp_path = config_dir / '.profile_stamp'
     try:
-        with open(profile_path, 'r', encoding='utf-8-sig') as f:
-            existing_content = f.read()
-    except UnicodeDecodeError:
-        with open(profile_path, 'r', encoding='utf-8') as f:
-            existing_content = f.read()
+        previous_stamp = stamp_path.read_text(encoding='utf-8')
+    except FileNotFoundError:
+        previous_stamp = None
 
-    if 'fastfetch -c' not in existing_content:
-        print("Adding fastfetch command to profile.")
-        new_content = profile_content_to_add + '\n\n' + existing_content
-        with open(profile_path, 'w', encoding='utf-8-sig') as f:
-            f.write(new_content)
-        print("Successfully updated PowerShell profile.")
+    if previous_stamp is not None and previous_stamp == get_file_stamp(profile_path):
+        print("PowerShell profile unchanged since the last run. No changes made.")
     else:
-        print("Fastfetch command already found in PowerShell profile. No changes made.")
+        update_powershell_profile(profile_path, profile_content_to_add)
+        write_if_changed(stamp_path, get_file_stamp(profile_path))
 
     print("Setup complete!")
 